@@ -12,7 +12,7 @@ from pathlib import Path
 # Add src to path for imports
 sys.path.append(str(Path(__file__).parent.parent / 'src'))
 
-from database import SQLServerConnection
+from database import get_connection_manager
 
 # Configure logging
 logging.basicConfig(
@@ -22,10 +22,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def create_products_table():
-    """Create the products table with sample schema."""
-    
-    create_table_sql = """
+# Schema statements, sent to the server together as one batch
+CREATE_TABLE_SQL = """
     IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='products' AND xtype='U')
     CREATE TABLE products (
         id INT IDENTITY(1,1) PRIMARY KEY,
@@ -38,40 +36,13 @@ def create_products_table():
         updated_at DATETIME2 DEFAULT GETDATE()
     )
     """
-    
-    create_index_sql = """
+
+CREATE_INDEX_SQL = """
     IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_products_category')
     CREATE INDEX IX_products_category ON products(category)
     """
-    
-    try:
-        conn_manager = SQLServerConnection()
-        
-        # Test connection first
-        if not conn_manager.test_pyodbc_connection():
-            logger.error("Cannot connect to database. Please check your connection settings.")
-            return False
-        
-        # Create table
-        logger.info("Creating products table...")
-        conn_manager.execute_query_pyodbc(create_table_sql)
-        
-        # Create index
-        logger.info("Creating index on category column...")
-        conn_manager.execute_query_pyodbc(create_index_sql)
-        
-        logger.info("✓ Products table created successfully!")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Failed to create products table: {e}")
-        return False
 
-
-def create_sample_data():
-    """Insert sample data into the products table."""
-    
-    sample_data_sql = """
+SAMPLE_DATA_SQL = """
     IF NOT EXISTS (SELECT * FROM products WHERE name = 'Sample Product 1')
     INSERT INTO products (name, description, price, category, stock_quantity) VALUES
     ('Sample Product 1', 'This is a sample product for testing', 29.99, 'Electronics', 100),
@@ -80,22 +51,30 @@ def create_sample_data():
     ('Sample Product 4', 'Yet another sample', 99.99, 'Home & Garden', 25),
     ('Sample Product 5', 'The last sample product', 15.99, 'Books', 150)
     """
+
+
+def create_schema(cursor):
+    """Create the products table, its index and sample data in a single batch."""
+    
+    batch_sql = ";\n".join([CREATE_TABLE_SQL, CREATE_INDEX_SQL, SAMPLE_DATA_SQL])
     
     try:
-        conn_manager = SQLServerConnection()
+        logger.info("Creating products table, index and sample data...")
+        cursor.execute(batch_sql)
         
-        logger.info("Inserting sample data...")
-        conn_manager.execute_query_pyodbc(sample_data_sql)
+        # Drain the result of each statement so errors in later ones surface
+        while cursor.nextset():
+            pass
         
-        logger.info("✓ Sample data inserted successfully!")
+        logger.info("✓ Products table and sample data created successfully!")
         return True
         
     except Exception as e:
-        logger.error(f"Failed to insert sample data: {e}")
+        logger.error(f"Failed to create schema: {e}")
         return False
 
 
-def verify_schema():
+def verify_schema(cursor):
     """Verify that the schema was created correctly."""
     
     verify_sql = """
@@ -107,17 +86,15 @@ def verify_schema():
     """
     
     try:
-        conn_manager = SQLServerConnection()
-        
         logger.info("Verifying schema...")
-        result = conn_manager.execute_query_pyodbc(verify_sql)
+        cursor.execute(verify_sql)
+        total_products, avg_price, total_stock = cursor.fetchone()
         
-        if not result.empty:
-            row = result.iloc[0]
+        if total_products:
             logger.info(f"✓ Schema verification successful!")
-            logger.info(f"  - Total products: {row['total_products']}")
-            logger.info(f"  - Average price: ${row['avg_price']:.2f}")
-            logger.info(f"  - Total stock: {row['total_stock']}")
+            logger.info(f"  - Total products: {total_products}")
+            logger.info(f"  - Average price: ${avg_price:.2f}")
+            logger.info(f"  - Total stock: {total_stock}")
             return True
         else:
             logger.warning("No data found in products table")
@@ -134,26 +111,34 @@ def main():
     print("=== Database Schema Initialization ===")
     print()
     
-    # Create products table
-    if create_products_table():
-        print("✓ Products table created")
-    else:
-        print("✗ Failed to create products table")
-        return False
+    conn_manager = get_connection_manager()
     
-    # Insert sample data
-    if create_sample_data():
-        print("✓ Sample data inserted")
-    else:
-        print("✗ Failed to insert sample data")
+    # Test connection first
+    if not conn_manager.test_pyodbc_connection():
+        logger.error("Cannot connect to database. Please check your connection settings.")
+        print("✗ Failed to create products table")
         return False
     
-    # Verify schema
-    if verify_schema():
-        print("✓ Schema verification passed")
-    else:
-        print("✗ Schema verification failed")
-        return False
+    # Run every step on one pooled connection
+    with conn_manager.connection() as conn:
+        cursor = conn.cursor()
+        
+        # Create products table and insert sample data
+        if create_schema(cursor):
+            print("✓ Products table created")
+            print("✓ Sample data inserted")
+        else:
+            print("✗ Failed to create products table")
+            return False
+        
+        conn.commit()
+        
+        # Verify schema
+        if verify_schema(cursor):
+            print("✓ Schema verification passed")
+        else:
+            print("✗ Schema verification failed")
+            return False
     
     print()
     print("=== Schema initialization completed successfully! ===")
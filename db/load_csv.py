@@ -6,15 +6,32 @@ Reads CSV files from the data directory and loads them into SQL Server tables.
 
 import sys
 import os
+import csv
+import shutil
 import logging
+import functools
+import tempfile
+import itertools
+import threading
+import subprocess
+import pyodbc
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# PyArrow's multi-threaded CSV reader is used when available
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+    pacsv = None
 
 # Add src to path for imports
 sys.path.append(str(Path(__file__).parent.parent / 'src'))
 
-from database import SQLServerConnection
+from database import get_connection_manager
 
 # Configure logging
 logging.basicConfig(
@@ -23,6 +40,82 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Rows sent per executemany batch
+LOAD_CSV_CHUNKSIZE = max(1, int(os.getenv('LOAD_CSV_CHUNKSIZE', '1000')))
+
+# CSV files loaded in parallel, each on its own connection
+LOAD_CSV_MAX_WORKERS = max(1, int(os.getenv('LOAD_CSV_MAX_WORKERS', '8')))
+
+# Files whose first read chunk has more prepared rows than this are loaded with
+# bcp when available
+LOAD_CSV_BCP_THRESHOLD = int(os.getenv('LOAD_CSV_BCP_THRESHOLD', '10000'))
+
+# Rows bcp commits per batch, and seconds to wait for each bcp run
+LOAD_CSV_BCP_BATCH_SIZE = int(os.getenv('LOAD_CSV_BCP_BATCH_SIZE', '100000'))
+LOAD_CSV_BCP_TIMEOUT = int(os.getenv('LOAD_CSV_BCP_TIMEOUT', '3600'))
+
+# Rows (pandas) or bytes (PyArrow) parsed per CSV read chunk
+CSV_READ_CHUNK_ROWS = 100_000
+CSV_READ_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Insert statement shared by every batch so the server reuses its prepared plan
+# (created_at/updated_at use DEFAULT GETDATE())
+PRODUCTS_INSERT_SQL = """
+    INSERT INTO products (name, description, price, category, stock_quantity)
+    VALUES (?, ?, ?, ?, ?)
+    """
+
+# Parameter types matching the products columns, so pyodbc doesn't have to
+# infer them from the data
+PRODUCTS_INPUT_SIZES = [
+    (pyodbc.SQL_WVARCHAR, 255, 0),
+    (pyodbc.SQL_WLONGVARCHAR, 0, 0),
+    (pyodbc.SQL_DOUBLE, 0, 0),
+    (pyodbc.SQL_WVARCHAR, 100, 0),
+    (pyodbc.SQL_INTEGER, 0, 0)
+]
+
+# Common CSV column names for each products column, in order of preference
+COLUMN_MAPPING = {
+    'name': ['name', 'product_name', 'title', 'product'],
+    'description': ['description', 'desc', 'product_description'],
+    'price': ['price', 'cost', 'amount', 'value'],
+    'category': ['category', 'cat', 'type', 'product_category'],
+    'stock_quantity': ['stock_quantity', 'stock', 'quantity', 'qty', 'inventory']
+}
+
+# CSV column name -> (products column, preference rank)
+_ALIAS_TO_TARGET = {
+    alias: (target_col, rank)
+    for target_col, aliases in COLUMN_MAPPING.items()
+    for rank, alias in enumerate(aliases)
+}
+
+# Products columns that prepare_products_data coerces to numbers
+NUMERIC_COLUMNS = ('price', 'stock_quantity')
+
+# Unit/record separators as bcp field/row terminators
+BCP_FIELD_TERMINATOR = '\x1f'
+BCP_ROW_TERMINATOR = '\x1e'
+BCP_FIELD_TERMINATOR_HEX = '0x1f'
+BCP_ROW_TERMINATOR_HEX = '0x1e'
+
+
+@functools.lru_cache(maxsize=1)
+def _sqlserver_bcp():
+    """Path of the SQL Server bcp utility, or None if it isn't installed."""
+    path = shutil.which('bcp')
+    if path is None:
+        return None
+    
+    # Other tools share the name (e.g. Boost's bcp), so check the banner
+    try:
+        result = subprocess.run([path, '-v'], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    
+    return path if 'SQL Server' in result.stdout else None
+
 
 def get_csv_files():
     """Get list of CSV files in the data directory."""
@@ -38,60 +131,139 @@ def get_csv_files():
     return csv_files
 
 
-def load_csv_to_products(csv_file):
-    """Load CSV data into the products table."""
+def read_csv_chunks(csv_file):
+    """Yield the CSV file as DataFrames of bounded size, using PyArrow when it is installed."""
     
-    try:
-        # Read CSV file
-        logger.info(f"Reading CSV file: {csv_file}")
-        df = pd.read_csv(csv_file)
+    if pacsv is not None:
+        yield from _read_csv_chunks_arrow(csv_file)
+        return
+    
+    with pd.read_csv(csv_file, chunksize=CSV_READ_CHUNK_ROWS) as reader:
+        yield from reader
+
+
+def _read_csv_chunks_arrow(csv_file):
+    """Yield the CSV file's products columns with PyArrow's streaming reader.
+    
+    Only columns that map to a products column are parsed. Numeric columns are
+    parsed as float64 by Arrow; if a value doesn't parse, the rest of the file
+    is re-read with them as strings so prepare_products_data can coerce it.
+    """
+    
+    with open(csv_file, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f), [])
+    
+    columns = [col for col in header if col in _ALIAS_TO_TARGET]
+    
+    if not columns:
+        # Nothing to load; let prepare_products_data report the missing columns
+        yield pd.DataFrame(columns=header)
+        return
+    
+    rows_read = 0
+    
+    for numeric_type in (pa.float64(), pa.string()):
+        # The streaming reader infers types from the first block only, so
+        # give every column an explicit type. Empty strings are treated as
+        # missing, matching pd.read_csv.
+        read_options = pacsv.ReadOptions(
+            block_size=CSV_READ_BLOCK_SIZE, skip_rows_after_names=rows_read
+        )
+        convert_options = pacsv.ConvertOptions(
+            include_columns=columns,
+            column_types={
+                col: numeric_type if _ALIAS_TO_TARGET[col][0] in NUMERIC_COLUMNS else pa.string()
+                for col in columns
+            },
+            strings_can_be_null=True
+        )
         
+        try:
+            with pacsv.open_csv(
+                str(csv_file), read_options=read_options, convert_options=convert_options
+            ) as reader:
+                for batch in reader:
+                    rows_read += batch.num_rows
+                    yield batch.to_pandas()
+            return
+        except pa.ArrowInvalid as e:
+            if numeric_type == pa.string():
+                raise
+            logger.info(f"Non-numeric values in {csv_file.name}, reading them as text: {e}")
+
+
+def prepared_chunks(csv_file):
+    """Yield the non-empty, cleaned chunks of a CSV file."""
+    
+    logger.info(f"Reading CSV file: {csv_file}")
+    
+    for chunk in read_csv_chunks(csv_file):
         # Display basic info about the data
-        logger.info(f"CSV contains {len(df)} rows and {len(df.columns)} columns")
-        logger.info(f"Columns: {list(df.columns)}")
+        logger.info(f"Read {len(chunk)} rows and {len(chunk.columns)} columns")
         
         # Clean and prepare data
-        df = prepare_products_data(df)
-        
-        if df.empty:
-            logger.warning("No valid data to insert after cleaning")
-            return False
+        chunk = prepare_products_data(chunk)
         
+        if not chunk.empty:
+            yield chunk
+
+
+def load_csv_to_products(csv_file, chunksize=None, commit_per_chunk=False):
+    """Load CSV data into the products table.
+    
+    The file is streamed in chunks so memory stays bounded regardless of its
+    size. The load method is chosen once per file from its first chunk:
+    
+    - By default rows are inserted with executemany in batches of
+      ``chunksize`` (defaults to LOAD_CSV_CHUNKSIZE). With ``commit_per_chunk``
+      each batch is committed on its own; otherwise the whole file is committed
+      once at the end and a failure rolls it all back.
+    - If the first chunk has more than LOAD_CSV_BCP_THRESHOLD rows and bcp is
+      installed, the file is loaded with bcp instead. bcp runs in its own
+      session and commits every LOAD_CSV_BCP_BATCH_SIZE rows, so a failure
+      partway through leaves the rows already copied in the table.
+    """
+    
+    if chunksize is None:
+        chunksize = LOAD_CSV_CHUNKSIZE
+    
+    try:
         # Load data into SQL Server using pyodbc for better reliability
-        conn_manager = SQLServerConnection()
+        conn_manager = get_connection_manager()
         
-        # Check if table exists, if not create it
+        # Create the table on first use; a no-op after the first successful call in this process
         create_table_if_not_exists(conn_manager)
         
-        # Insert data using pyodbc for better performance
-        logger.info(f"Inserting {len(df)} rows into products table...")
-        
-        # Get connection
-        conn = conn_manager.get_pyodbc_connection()
-        cursor = conn.cursor()
+        chunks = prepared_chunks(csv_file)
+        first_chunk = next(chunks, None)
         
-        # Prepare insert statement
-        insert_sql = """
-        INSERT INTO products (name, description, price, category, stock_quantity, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
+        if first_chunk is None:
+            logger.warning("No valid data to insert after cleaning")
+            return False
         
-        # Insert rows
-        for _, row in df.iterrows():
-            cursor.execute(insert_sql, (
-                row['name'],
-                row['description'],
-                row['price'],
-                row['category'],
-                row['stock_quantity'],
-                row['created_at'],
-                row['updated_at']
-            ))
+        chunks = itertools.chain([first_chunk], chunks)
+        total_rows = 0
         
-        conn.commit()
-        conn.close()
+        # Large files go through bcp, small ones through executemany
+        if len(first_chunk) > LOAD_CSV_BCP_THRESHOLD and _sqlserver_bcp():
+            for chunk in chunks:
+                bulk_copy_products(conn_manager, chunk)
+                total_rows += len(chunk)
+        else:
+            # Borrow a pooled connection for the whole file
+            with conn_manager.connection() as conn:
+                # Keep one cursor for every batch so the insert is prepared once
+                cursor = conn.cursor()
+                cursor.fast_executemany = True
+                
+                for chunk in chunks:
+                    insert_products(cursor, chunk, chunksize, commit_per_chunk)
+                    total_rows += len(chunk)
+                
+                cursor.close()
+                conn.commit()
         
-        logger.info(f"✓ Successfully loaded {len(df)} rows from {csv_file.name}")
+        logger.info(f"✓ Successfully loaded {total_rows} rows from {csv_file.name}")
         return True
         
     except Exception as e:
@@ -99,62 +271,172 @@ def load_csv_to_products(csv_file):
         return False
 
 
+def insert_products(cursor, df, chunksize, commit_per_chunk=False):
+    """Insert prepared rows into the products table using executemany.
+    
+    ``cursor`` should have fast_executemany enabled so parameters are sent as
+    arrays. Committing is left to the caller unless ``commit_per_chunk`` is set.
+    """
+    
+    # Insert data using pyodbc for better performance
+    logger.info(f"Inserting {len(df)} rows into products table...")
+    
+    params = df[[
+        'name',
+        'description',
+        'price',
+        'category',
+        'stock_quantity'
+    ]].astype(object)
+    
+    # Missing values must bind as NULL, not as a float NaN
+    params = params.where(params.notna(), None)
+    
+    # Build parameter tuples straight from the column arrays
+    rows = list(params.itertuples(index=False, name=None))
+    
+    # Fix parameter types up front instead of scanning the rows for them
+    cursor.setinputsizes(PRODUCTS_INPUT_SIZES)
+    
+    # Insert rows in chunks to bound batch size
+    for i in range(0, len(rows), chunksize):
+        cursor.executemany(PRODUCTS_INSERT_SQL, rows[i:i + chunksize])
+        if commit_per_chunk:
+            cursor.connection.commit()
+
+
+def bulk_copy_products(conn_manager, df, batch_size=None):
+    """Bulk load prepared rows into the products table with the bcp utility.
+    
+    bcp commits every ``batch_size`` rows (defaults to LOAD_CSV_BCP_BATCH_SIZE)
+    in its own session, independent of any open pyodbc transaction.
+    """
+    
+    if batch_size is None:
+        batch_size = LOAD_CSV_BCP_BATCH_SIZE
+    
+    logger.info(f"Bulk copying {len(df)} rows into products table with bcp...")
+    
+    # bcp maps fields to table columns by position, so the data file carries
+    # empty id/created_at/updated_at fields: the identity and DEFAULT GETDATE()
+    # fill them in. Control characters are used as terminators so commas and
+    # newlines inside descriptions survive unquoted.
+    bcp_df = df.reindex(columns=[
+        'id',
+        'name',
+        'description',
+        'price',
+        'category',
+        'stock_quantity',
+        'created_at',
+        'updated_at'
+    ])
+    
+    fd, data_file = tempfile.mkstemp(suffix='.dat')
+    os.close(fd)
+    
+    try:
+        bcp_df.to_csv(
+            data_file,
+            sep=BCP_FIELD_TERMINATOR,
+            lineterminator=BCP_ROW_TERMINATOR,
+            header=False,
+            index=False,
+            quoting=csv.QUOTE_NONE,
+            # QUOTE_NONE still escapes the quote character, so pick one that
+            # cannot appear in a field
+            quotechar=BCP_ROW_TERMINATOR,
+            encoding='utf-8'
+        )
+        
+        command = [
+            _sqlserver_bcp(), 'products', 'in', data_file,
+            '-S', f"{conn_manager.sql_server},{conn_manager.sql_port}",
+            '-d', conn_manager.sql_db,
+            '-U', conn_manager.sql_user,
+            '-P', conn_manager.sql_password,
+            '-l', str(conn_manager.sql_login_timeout),
+            # Character mode; the Linux/macOS bcp has no -C code page option
+            # and reads the UTF-8 file in the locale's (UTF-8) encoding
+            '-c',
+            '-t', BCP_FIELD_TERMINATOR_HEX,
+            '-r', BCP_ROW_TERMINATOR_HEX,
+            '-b', str(batch_size)
+        ]
+        
+        # -u trusts the server certificate, matching the pyodbc connections
+        if conn_manager.sql_trust_server_certificate == 'yes':
+            command.append('-u')
+        
+        # No TABLOCK hint: its bulk-update lock would wait on the row locks of
+        # other files being inserted concurrently
+        result = subprocess.run(
+            command, capture_output=True, text=True, timeout=LOAD_CSV_BCP_TIMEOUT
+        )
+        
+        if result.returncode != 0:
+            raise RuntimeError(f"bcp failed: {result.stdout.strip()} {result.stderr.strip()}")
+        
+        logger.info(f"bcp output: {result.stdout.strip()}")
+        
+    finally:
+        os.remove(data_file)
+
+
 def prepare_products_data(df):
     """Prepare and clean the DataFrame for products table."""
     
-    # Map common column names to our schema
-    column_mapping = {
-        'name': ['name', 'product_name', 'title', 'product'],
-        'description': ['description', 'desc', 'product_description'],
-        'price': ['price', 'cost', 'amount', 'value'],
-        'category': ['category', 'cat', 'type', 'product_category'],
-        'stock_quantity': ['stock_quantity', 'stock', 'quantity', 'qty', 'inventory']
-    }
+    # Pick the highest-priority source column present for each target column
+    matches = {}
+    for col_name in df.columns:
+        match = _ALIAS_TO_TARGET.get(col_name)
+        if match is None:
+            continue
+        target_col, rank = match
+        if target_col not in matches or rank < matches[target_col][1]:
+            matches[target_col] = (col_name, rank)
     
-    # Try to map columns
-    mapped_df = pd.DataFrame()
+    # Ensure required columns exist
+    if 'name' not in matches:
+        logger.error("No valid product name column found in CSV")
+        return pd.DataFrame()
     
-    for target_col, possible_names in column_mapping.items():
-        for col_name in possible_names:
-            if col_name in df.columns:
-                mapped_df[target_col] = df[col_name]
-                break
-        else:
-            # If no matching column found, create empty column
-            if target_col == 'price':
-                mapped_df[target_col] = 0.0
-            elif target_col == 'stock_quantity':
-                mapped_df[target_col] = 0
-            else:
-                mapped_df[target_col] = ''
+    reverse_map = {col_name: target_col for target_col, (col_name, _) in matches.items()}
     
-    # Clean data
-    if 'price' in mapped_df.columns:
-        # Convert price to numeric, handle errors
-        mapped_df['price'] = pd.to_numeric(mapped_df['price'], errors='coerce').fillna(0.0)
+    # Rename and select the mapped columns in a single pass. Unmatched text
+    # columns are left missing so both load paths store NULL for them: bcp
+    # loads an empty field as NULL, so an empty string can't be kept there.
+    mapped_df = df.rename(columns=reverse_map).reindex(columns=list(COLUMN_MAPPING))
     
-    if 'stock_quantity' in mapped_df.columns:
-        # Convert stock to integer, handle errors
-        mapped_df['stock_quantity'] = pd.to_numeric(mapped_df['stock_quantity'], errors='coerce').fillna(0).astype(int)
+    # Clean data: coerce numerics, treating unparseable or missing values as 0
+    mapped_df['price'] = pd.to_numeric(
+        mapped_df['price'], errors='coerce'
+    ).to_numpy(dtype=np.float64, na_value=0.0)
+    mapped_df['stock_quantity'] = pd.to_numeric(
+        mapped_df['stock_quantity'], errors='coerce'
+    ).to_numpy(dtype=np.int64, na_value=0)
     
-    # Ensure required columns exist
-    if 'name' not in mapped_df.columns or mapped_df['name'].isna().all():
+    if mapped_df['name'].isna().all():
         logger.error("No valid product name column found in CSV")
         return pd.DataFrame()
     
     # Remove rows with empty names
     mapped_df = mapped_df.dropna(subset=['name'])
     
-    # Add timestamp columns
-    mapped_df['created_at'] = datetime.now()
-    mapped_df['updated_at'] = datetime.now()
-    
     logger.info(f"Prepared {len(mapped_df)} valid rows for insertion")
     return mapped_df
 
 
+_table_created = False
+_table_created_lock = threading.Lock()
+
+
 def create_table_if_not_exists(conn_manager):
-    """Create products table if it doesn't exist."""
+    """Create products table if it doesn't exist.
+    
+    The check runs once per process; later calls return without a round trip.
+    """
+    global _table_created
     
     create_table_sql = """
     IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='products' AND xtype='U')
@@ -170,12 +452,24 @@ def create_table_if_not_exists(conn_manager):
     )
     """
     
-    try:
-        conn_manager.execute_query_pyodbc(create_table_sql)
-        logger.info("Products table created (if it didn't exist)")
-    except Exception as e:
-        logger.error(f"Failed to create products table: {e}")
-        raise
+    with _table_created_lock:
+        if _table_created:
+            return
+        
+        try:
+            conn_manager.execute_query_pyodbc(create_table_sql, fetch=False)
+            logger.info("Products table created (if it didn't exist)")
+        except Exception as e:
+            logger.error(f"Failed to create products table: {e}")
+            raise
+        
+        _table_created = True
+
+
+def load_csv_file(csv_file):
+    """Load a single CSV file, logging which file is being processed."""
+    logger.info(f"Processing {csv_file.name}...")
+    return load_csv_to_products(csv_file)
 
 
 def load_all_csv_files():
@@ -191,13 +485,21 @@ def load_all_csv_files():
     success_count = 0
     total_files = len(csv_files)
     
-    for csv_file in csv_files:
-        logger.info(f"Processing {csv_file.name}...")
+    # Create the table up front so concurrent loads don't race on the DDL
+    try:
+        create_table_if_not_exists(get_connection_manager())
+    except Exception:
+        return False
+    
+    # Load files concurrently; each load opens its own pyodbc connection
+    with ThreadPoolExecutor(max_workers=min(LOAD_CSV_MAX_WORKERS, total_files)) as executor:
+        results = executor.map(load_csv_file, csv_files)
         
-        if load_csv_to_products(csv_file):
-            success_count += 1
-        else:
-            logger.error(f"Failed to load {csv_file.name}")
+        for csv_file, loaded in zip(csv_files, results):
+            if loaded:
+                success_count += 1
+            else:
+                logger.error(f"Failed to load {csv_file.name}")
     
     logger.info(f"=== CSV Loading Summary ===")
     logger.info(f"Successfully loaded: {success_count}/{total_files} files")
@@ -1,5 +1,10 @@
 import os
+import re
+import queue
 import logging
+import threading
+import functools
+from contextlib import contextmanager
 import pyodbc
 import pandas as pd
 from sqlalchemy import create_engine, text
@@ -16,6 +21,67 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Enable ODBC driver manager connection pooling (must be set before connecting)
+pyodbc.pooling = True
+
+# Idle pyodbc connections kept per connection manager
+POOL_SIZE = 8
+
+# Matches queries that return rows, skipping leading whitespace and comments
+_SELECT_RE = re.compile(r'(?:\s|--[^\n]*(?:\n|$)|/\*.*?\*/)*select\b', re.IGNORECASE | re.DOTALL)
+
+
+def _returns_rows(query, fetch):
+    """Whether to fetch results: ``fetch`` if given, else whether the query is a SELECT."""
+    if fetch is None:
+        return _SELECT_RE.match(query) is not None
+    return fetch
+
+
+@functools.lru_cache(maxsize=1)
+def _cached_drivers():
+    """Installed ODBC drivers, read from the driver manager once per process."""
+    return tuple(pyodbc.drivers())
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable pyodbc connections."""
+    
+    def __init__(self, connect, maxsize=POOL_SIZE):
+        self._connect = connect
+        self._idle = queue.Queue(maxsize=maxsize)
+    
+    @contextmanager
+    def get(self):
+        """Borrow a connection, returning it to the pool when done."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        
+        try:
+            yield conn
+        except Exception:
+            # The connection may be in a bad state, so don't reuse it
+            conn.close()
+            raise
+        
+        # Reset transaction state before handing the connection out again
+        try:
+            conn.rollback()
+            conn.autocommit = False
+            self._idle.put_nowait(conn)
+        except (pyodbc.Error, queue.Full):
+            conn.close()
+    
+    def close_all(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
 
 class SQLServerConnection:
     """SQL Server connection manager with both pyodbc and SQLAlchemy support."""
@@ -26,27 +92,39 @@ class SQLServerConnection:
         self.sql_server = os.getenv('SQL_SERVER', 'localhost')
         self.sql_port = os.getenv('SQL_PORT', '1433')
         self.sql_db = os.getenv('SQL_DB', 'master')
+        # The local container uses a self-signed certificate
+        self.sql_trust_server_certificate = os.getenv('SQL_TRUST_SERVER_CERTIFICATE', 'yes').strip().lower()
+        self.sql_login_timeout = int(os.getenv('SQL_LOGIN_TIMEOUT', '30'))
+        self.sql_keepalive = int(os.getenv('SQL_KEEPALIVE', '30'))
         
-        # Build connection strings
+        # Build connection strings. TCP keepalive probes stop idle pooled
+        # connections from being dropped by NAT/firewall timeouts, so they
+        # don't have to be reopened with a fresh TLS handshake.
         self.odbc_connection_string = (
             f"DRIVER={{ODBC Driver 18 for SQL Server}};"
             f"SERVER={self.sql_server},{self.sql_port};"
             f"DATABASE={self.sql_db};"
             f"UID={self.sql_user};"
             f"PWD={self.sql_password};"
-            f"TrustServerCertificate=yes;"
+            f"Encrypt=yes;"
+            f"TrustServerCertificate={self.sql_trust_server_certificate};"
+            f"KeepAlive={self.sql_keepalive};"
         )
         
         self.sqlalchemy_url = (
             f"mssql+pyodbc://{self.sql_user}:{self.sql_password}@"
             f"{self.sql_server}:{self.sql_port}/{self.sql_db}?"
-            f"driver=ODBC+Driver+18+for+SQL+Server&TrustServerCertificate=yes"
-            f"&timeout=30&connection_timeout=30"
+            f"driver=ODBC+Driver+18+for+SQL+Server&Encrypt=yes"
+            f"&TrustServerCertificate={self.sql_trust_server_certificate}"
+            f"&KeepAlive={self.sql_keepalive}"
+            f"&timeout={self.sql_login_timeout}&connection_timeout={self.sql_login_timeout}"
         )
+        
+        self._pool = ConnectionPool(self.get_pyodbc_connection)
     
     def get_odbc_drivers(self):
         """List available ODBC drivers for SQL Server."""
-        drivers = pyodbc.drivers()
+        drivers = _cached_drivers()
         sql_server_drivers = [driver for driver in drivers if 'SQL Server' in driver]
         logger.info(f"Available SQL Server ODBC drivers: {sql_server_drivers}")
         return sql_server_drivers
@@ -60,14 +138,14 @@ class SQLServerConnection:
                 logger.error("No SQL Server ODBC drivers found!")
                 return False
             
-            # Try to connect
-            conn = pyodbc.connect(self.odbc_connection_string)
-            cursor = conn.cursor()
-            cursor.execute("SELECT @@VERSION")
-            version = cursor.fetchone()[0]
+            # Try to connect; the connection stays pooled for the next caller
+            with self._pool.get() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT @@VERSION")
+                version = cursor.fetchone()[0]
+            
             logger.info(f"Successfully connected to SQL Server using pyodbc")
             logger.info(f"Server version: {version}")
-            conn.close()
             return True
             
         except pyodbc.Error as e:
@@ -92,11 +170,15 @@ class SQLServerConnection:
     def get_pyodbc_connection(self):
         """Get a pyodbc connection."""
         try:
-            return pyodbc.connect(self.odbc_connection_string)
+            return pyodbc.connect(self.odbc_connection_string, timeout=self.sql_login_timeout)
         except pyodbc.Error as e:
             logger.error(f"Failed to create pyodbc connection: {e}")
             raise
     
+    def connection(self):
+        """Borrow a pooled pyodbc connection for use in a ``with`` block."""
+        return self._pool.get()
+    
     def get_sqlalchemy_engine(self):
         """Get a SQLAlchemy engine."""
         try:
@@ -105,35 +187,58 @@ class SQLServerConnection:
             logger.error(f"Failed to create SQLAlchemy engine: {e}")
             raise
     
-    def execute_query_pyodbc(self, query, params=None):
-        """Execute a query using pyodbc."""
+    def execute_query_pyodbc(self, query, params=None, fetch=None):
+        """Execute a query using pyodbc.
+        
+        Results are returned as a DataFrame when ``fetch`` is true; otherwise
+        the query is committed. Left as None, SELECT queries are fetched.
+        """
         try:
-            conn = self.get_pyodbc_connection()
-            cursor = conn.cursor()
-            
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            if query.strip().upper().startswith('SELECT'):
-                results = cursor.fetchall()
-                columns = [column[0] for column in cursor.description]
-                df = pd.DataFrame.from_records(results, columns=columns)
-                conn.close()
-                return df
-            else:
-                conn.commit()
-                conn.close()
-                logger.info(f"Query executed successfully: {query[:50]}...")
-                return True
+            with self._pool.get() as conn:
+                cursor = conn.cursor()
+                
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                
+                if _returns_rows(query, fetch):
+                    results = cursor.fetchall()
+                    columns = [column[0] for column in cursor.description]
+                    df = pd.DataFrame.from_records(results, columns=columns)
+                    return df
+                else:
+                    conn.commit()
+                    logger.info(f"Query executed successfully: {query[:50]}...")
+                    return True
+                
+        except pyodbc.Error as e:
+            logger.error(f"Query execution failed: {e}")
+            raise
+    
+    def execute_one(self, query, params=None):
+        """Execute a query using pyodbc and return its first row, or None."""
+        try:
+            with self._pool.get() as conn:
+                cursor = conn.cursor()
+                
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                
+                row = cursor.fetchone()
+                return tuple(row) if row is not None else None
                 
         except pyodbc.Error as e:
             logger.error(f"Query execution failed: {e}")
             raise
     
-    def execute_query_sqlalchemy(self, query, params=None):
-        """Execute a query using SQLAlchemy."""
+    def execute_query_sqlalchemy(self, query, params=None, fetch=None):
+        """Execute a query using SQLAlchemy.
+        
+        ``fetch`` behaves as in execute_query_pyodbc.
+        """
         try:
             engine = self.get_sqlalchemy_engine()
             with engine.connect() as conn:
@@ -142,7 +247,7 @@ class SQLServerConnection:
                 else:
                     result = conn.execute(text(query))
                 
-                if query.strip().upper().startswith('SELECT'):
+                if _returns_rows(query, fetch):
                     df = pd.DataFrame(result.fetchall(), columns=result.keys())
                     return df
                 else:
@@ -155,6 +260,20 @@ class SQLServerConnection:
             raise
 
 
+_connection_manager = None
+_connection_manager_lock = threading.Lock()
+
+
+def get_connection_manager():
+    """Return the shared SQLServerConnection, creating it on first use."""
+    global _connection_manager
+    
+    with _connection_manager_lock:
+        if _connection_manager is None:
+            _connection_manager = SQLServerConnection()
+        return _connection_manager
+
+
 def test_connections():
     """Test both connection methods and list available drivers."""
     conn_manager = SQLServerConnection()